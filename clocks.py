@@ -1,13 +1,21 @@
 import sys
-import requests
+import os
+import argparse
+import struct
+import signal
 import io
+import requests
+from multiprocessing import shared_memory
+from concurrent.futures import ThreadPoolExecutor, wait
+from weather_history import WeatherHistory
 import matplotlib.pyplot as plt
 from PyQt6.QtWidgets import (QApplication, QMainWindow, QVBoxLayout, QHBoxLayout, QWidget, QPushButton, 
                                 QLineEdit, QLabel, QListWidget, QGraphicsView, QGraphicsScene, QFrame, 
                                 QTextBrowser, QScrollArea, QSizePolicy, QMessageBox, QInputDialog)
-from PyQt6.QtCore import QTimer, Qt, QRectF, QPointF
-from PyQt6.QtGui import QPen, QBrush, QColor, QPainter, QFont, QPixmap, QImage, QIcon
+from PyQt6.QtCore import QTimer, Qt, QRectF, QPointF, QLineF
+from PyQt6.QtGui import QPen, QBrush, QColor, QPainter, QFont, QPixmap, QImage, QIcon, QPolygonF, QRegion
 from datetime import datetime
+from time import perf_counter
 import math
 import pytz
 from geopy.geocoders import Nominatim
@@ -258,8 +266,8 @@ class CountryShapeWidget(QLabel):
             url = f"https://teuteuf-dashboard-assets.pages.dev/data/common/country-shapes/{country_code}.svg"
             flag_url = f"https://flagicons.lipis.dev/flags/4x3/{country_code}.svg"
             try:
-                response = requests.get(url)
-                flag_response = requests.get(flag_url)
+                response = requests.get(url, timeout=10)
+                flag_response = requests.get(flag_url, timeout=10)
                 if response.status_code == 200 and flag_response.status_code == 200:
                     # If the regular country name works, use it
                     img_data = response.content
@@ -316,39 +324,153 @@ class CountryShapeWidget(QLabel):
         # Set the pixmap to the label
         self.setPixmap(pixmap.scaled(100, 100, Qt.AspectRatioMode.KeepAspectRatio, Qt.TransformationMode.SmoothTransformation))
 
+class FrameClock:
+    # Single timer shared by every ClockWidget, so a wall of clocks costs one wakeup per frame
+    MIN_FPS = 10
+    CPU_BUDGET = 0.5  # Share of each frame the clocks may spend advancing and painting
+
+    def __init__(self):
+        self.clocks = []
+        self.target_fps = 0  # 0 keeps the ticking second hand, 30 or 60 sweeps smoothly
+        self.fps = 1
+        self.paint_time = 0.0  # Added to by ClockWidget.paintEvent
+        self.frame_cost = 0.0
+        self.frames = 0
+        self.timer = QTimer()
+        self.timer.setTimerType(Qt.TimerType.PreciseTimer)
+        self.timer.timeout.connect(self.tick)
+        self.set_fps(self.fps)
+
+    @property
+    def smooth(self):
+        return self.target_fps > 0
+
+    def register(self, clock):
+        self.clocks.append(clock)
+        clock.destroyed.connect(lambda: self.clocks.remove(clock))
+
+    def set_target_fps(self, fps):
+        self.target_fps = fps
+        self.set_fps(fps or 1)
+
+    def set_fps(self, fps):
+        self.fps = fps
+        self.frame_cost = 0.0
+        self.frames = 0
+        self.timer.start(round(1000 / fps))
+
+    def tick(self):
+        start = perf_counter()
+        now = datetime.now(pytz.utc)
+        for clock in self.clocks:
+            # Clocks scrolled out of view are brought up to date by the next frame they are visible in
+            if self.smooth and clock.visibleRegion().isEmpty():
+                continue
+            clock.advance(now)
+        self.frame_cost += perf_counter() - start + self.paint_time
+        self.paint_time = 0.0
+        self.frames += 1
+        if self.smooth and self.frames >= self.fps:
+            self.adjust_fps()
+
+    def adjust_fps(self):
+        # Checked about once a second: halve the frame rate when over budget, double it again when there is room
+        average = self.frame_cost / self.frames
+        budget = self.CPU_BUDGET / self.fps
+        if average > budget and self.fps > self.MIN_FPS:
+            self.set_fps(max(self.fps // 2, self.MIN_FPS))
+        elif average < budget / 2.5 and self.fps < self.target_fps:
+            self.set_fps(min(self.fps * 2, self.target_fps))
+        else:
+            self.frame_cost = 0.0
+            self.frames = 0
+
 class ClockWidget(QGraphicsView):
+    frame_clock = None  # Shared FrameClock, created with the first clock
+
     def __init__(self, parent=None):
         super().__init__(parent)
         self.scene = QGraphicsScene(self)
+        self.scene.setSceneRect(QRectF(0, 0, 140, 140))
         self.setScene(self.scene)
         self.setFixedSize(150, 150)
         self.setRenderHint(QPainter.RenderHint.Antialiasing)
+        # The face is painted in drawBackground, so Qt keeps it in a cached pixmap and only the hands are redrawn
+        self.setCacheMode(QGraphicsView.CacheModeFlag.CacheBackground)
         self.location_abbr = ""
         self.country_code = ""
         self.setStyleSheet("border-radius: 10px; background-color: #2C2C2C;")
         self.time = None
-        self.draw_static_elements()
-        self.update_timer = QTimer(self)
-        self.update_timer.timeout.connect(self.update_clock)
-        self.update_timer.start(1000)  # Update every second
+        self.center = QPointF(75, 75)
+        self.hand_pens = (QPen(QColor("#FFFFFF"), 3), QPen(QColor("#66B2FF"), 2), QPen(QColor("#FF6666"), 1))  # Hour, minute, second
+        self.hand_lines = ()
+        self.label_font = QFont("Arial", 18, QFont.Weight.Bold)
+        self.label_pen = QPen(QColor("#FFFFFF"))
+        self.text_rect = None
+        self.shared_frame_clock().register(self)
+
+    @classmethod
+    def shared_frame_clock(cls):
+        if cls.frame_clock is None:
+            cls.frame_clock = FrameClock()
+        return cls.frame_clock
 
-    def update_clock(self):
+    def advance(self, now):
         if self.time:
-            self.time = datetime.now(self.time.tzinfo)
-            self.viewport().update()
+            self.set_time(now.astimezone(self.time.tzinfo))
 
     def update_time(self, time, location_abbr, country_code):
+        # Only sets the first time and the label, the hands are moved by the shared frame clock
+        if self.time is None or (location_abbr, country_code) != (self.location_abbr, self.country_code):
+            self.location_abbr = location_abbr
+            self.country_code = country_code
+            self.text_rect = None
+            self.time = time
+            self.hand_lines = self.compute_hand_lines()
+            self.viewport().update()
+
+    def set_time(self, time):
         self.time = time
-        self.location_abbr = location_abbr
-        self.country_code = country_code
-        self.viewport().update()
-    
-    def draw_static_elements(self):
+        # Repaint only the area swept by each hand whose tip moved visibly, the others keep their old line
+        dirty = QRegion()
+        hand_lines = []
+        for old, new, pen in zip(self.hand_lines, self.compute_hand_lines(), self.hand_pens):
+            if QLineF(old.p2(), new.p2()).length() < 0.5:
+                hand_lines.append(old)
+                continue
+            margin = pen.widthF() + 1
+            for line in (old, new):
+                dirty = dirty.united(QRegion(QRectF(line.p1(), line.p2()).normalized().adjusted(-margin, -margin, margin, margin).toAlignedRect()))
+            hand_lines.append(new)
+        self.hand_lines = tuple(hand_lines)
+        if not dirty.isEmpty():
+            self.viewport().update(dirty)
+
+    def compute_hand_lines(self):
+        if self.frame_clock.smooth:
+            seconds = self.time.second + self.time.microsecond / 1000000
+            minutes = self.time.minute + seconds / 60
+            angles = ((self.time.hour % 12 + minutes / 60) * 30, minutes * 6, seconds * 6)
+        else:
+            angles = (self.time.hour % 12 * 30 + self.time.minute / 2, self.time.minute * 6, self.time.second * 6)
+        return tuple(self.hand_line(angle, length) for angle, length in zip(angles, (40, 55, 60)))
+
+    def hand_line(self, angle, length):
+        radians = math.radians(angle)
+        return QLineF(self.center, self.center + QPointF(length * math.sin(radians), -length * math.cos(radians)))
+
+    def drawBackground(self, painter, rect):
+        super().drawBackground(painter, rect)
+        self.draw_static_elements(painter)
+
+    def draw_static_elements(self, painter):
         bg_color = QColor("#2C2C2C")
         fg_color = QColor("#FFFFFF")
         
         # Draw clock face
-        self.scene.addEllipse(QRectF(0, 0, 140, 140), QPen(fg_color), QBrush(bg_color))
+        painter.setPen(QPen(fg_color))
+        painter.setBrush(QBrush(bg_color))
+        painter.drawEllipse(QRectF(0, 0, 140, 140))
         
         # Draw hour marks
         for i in range(12):
@@ -357,35 +479,64 @@ class ClockWidget(QGraphicsView):
             y1 = 70 + 65 * math.sin(math.radians(angle))
             x2 = 70 + 60 * math.cos(math.radians(angle))
             y2 = 70 + 60 * math.sin(math.radians(angle))
-            self.scene.addLine(x1, y1, x2, y2, QPen(fg_color))
+            painter.drawLine(QPointF(x1, y1), QPointF(x2, y2))
 
     def paintEvent(self, event):
+        start = perf_counter()
         super().paintEvent(event)
         if self.time:
             painter = QPainter(self.viewport())
             painter.setRenderHint(QPainter.RenderHint.Antialiasing)
             
-            fg_color = QColor("#FFFFFF")
-            
             # Draw hands
-            self.draw_hand(painter, self.time.hour % 12 * 30 + self.time.minute / 2, 40, 3, fg_color)  # Hour hand
-            self.draw_hand(painter, self.time.minute * 6, 55, 2, QColor("#66B2FF"))  # Minute hand
-            self.draw_hand(painter, self.time.second * 6, 60, 1, QColor("#FF6666"))  # Second hand
+            for line, pen in zip(self.hand_lines, self.hand_pens):
+                painter.setPen(pen)
+                painter.drawLine(line)
 
             # Add location abbreviation and flag
-            painter.setFont(QFont("Arial", 18, QFont.Weight.Bold))
-            painter.setPen(fg_color)
+            painter.setFont(self.label_font)
+            painter.setPen(self.label_pen)
             text = f"{self.location_abbr} {self.country_code}"
-            text_rect = painter.boundingRect(self.rect(), Qt.AlignmentFlag.AlignCenter, text)
-            painter.drawText(text_rect, Qt.AlignmentFlag.AlignCenter, text)
+            if self.text_rect is None:
+                self.text_rect = painter.boundingRect(self.rect(), Qt.AlignmentFlag.AlignCenter, text)
+            painter.drawText(self.text_rect, Qt.AlignmentFlag.AlignCenter, text)
+            painter.end()
+        self.frame_clock.paint_time += perf_counter() - start
+
+class WeatherTrendWidget(QWidget):
+    # Sparkline per weather column, each scaled to its own min/max
+    TRENDS = (("temp", "°C", QColor("#FF6666")), ("humidity", "%", QColor("#66B2FF")),
+              ("wind", "m/s", QColor("#FFFFFF")), ("precipitation", "mm", QColor("#8553ad")))
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setFixedSize(120, 80)
+        self.series = {}
 
-    def draw_hand(self, painter, angle, length, width, color):
-        painter.save()
-        painter.translate(75, 75)
-        painter.rotate(angle)
-        painter.setPen(QPen(color, width))
-        painter.drawLine(0, 0, 0, -length)
-        painter.restore()
+    def set_series(self, series):
+        self.series = series
+        self.setToolTip("\n".join(f"{name.capitalize()}: {min(values):.1f} - {max(values):.1f} {unit}"
+                                  for name, unit, _ in self.TRENDS
+                                  if (values := self.series.get(name))))
+        self.update()
+
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        painter.setRenderHint(QPainter.RenderHint.Antialiasing)
+        row_height = self.height() / len(self.TRENDS)
+        for row, (name, _, color) in enumerate(self.TRENDS):
+            values = self.series.get(name)
+            if not values or len(values) < 2:
+                continue
+            low, high = min(values), max(values)
+            span = (high - low) or 1
+            top = row * row_height + 2
+            height = row_height - 4
+            step = (self.width() - 1) / (len(values) - 1)
+            line = QPolygonF([QPointF(i * step, top + height - (value - low) / span * height)
+                              for i, value in enumerate(values)])
+            painter.setPen(QPen(color, 1))
+            painter.drawPolyline(line)
 
 class LocationSection(QFrame):
     def __init__(self):
@@ -407,11 +558,13 @@ class LocationSection(QFrame):
         self.weather_layout.addWidget(self.weather_label)  # Add the weather label to the layout
         self.weather_layout.setContentsMargins(0, 0, 0, 0)  # Remove margins from the weather layout
         self.weather_layout.setSpacing(5)  # Decrease spacing between weather icon and label
+        self.weather_trend = WeatherTrendWidget()  # Sparklines of the recorded weather history
         self.layout.addWidget(self.clock)
         self.layout.addWidget(self.country_shape)
         self.layout.addWidget(self.flag_label)
         self.layout.addWidget(self.info_label)
         self.layout.addStretch()  # Add stretch to push weather info to the right
+        self.layout.addWidget(self.weather_trend)
         self.layout.addLayout(self.weather_layout)  # Add the weather layout to the main layout
         self.layout.addSpacing(50)  # Add 10px of space to the right of the weather info
         self.setFrameShape(QFrame.Shape.Box)
@@ -420,8 +573,9 @@ class LocationSection(QFrame):
         self.layout.setSpacing(10)  # Add spacing between widgets
 
 class WorldClockComparison(QMainWindow):
-    def __init__(self):
+    def __init__(self, headless=False):
         super().__init__()
+        self.headless = headless  # No window is shown, so never open dialogs
         self.setWindowTitle("World Clock Comparison")
         self.setGeometry(100, 100, 1000, 600)
         icon = QIcon("Wclock.png")
@@ -462,11 +616,14 @@ class WorldClockComparison(QMainWindow):
         self.format_toggle.clicked.connect(self.toggle_time_format)
         self.use_24_hour = False
         
+        self.sweep_toggle = QPushButton("Sweep: off")
+        self.sweep_toggle.clicked.connect(self.toggle_sweep)
 
         input_layout = QHBoxLayout()
         input_layout.addWidget(self.location_input)
         input_layout.addWidget(self.add_button)
         input_layout.addWidget(self.format_toggle)
+        input_layout.addWidget(self.sweep_toggle)
         input_layout.addWidget(self.api_key_button)
         self.layout.addLayout(input_layout)
 
@@ -488,6 +645,9 @@ class WorldClockComparison(QMainWindow):
 
         self.geolocator = Nominatim(user_agent="world_clock_comparison")
         self.tf = TimezoneFinder()
+        self.weather_history = WeatherHistory()
+        self.weather_pool = ThreadPoolExecutor(max_workers=8)
+        self.weather_requests = {}  # LocationSection -> Future of fetch_weather
         
     
     
@@ -503,6 +663,8 @@ class WorldClockComparison(QMainWindow):
         return None
     
     def request_api_key(self):
+        if self.headless:
+            return None
         api_key, ok = QInputDialog.getText(self, 'OpenWeather API Key Required', 'Please enter your API key:')
         if ok and api_key:
             # Save the key for future use
@@ -518,10 +680,11 @@ class WorldClockComparison(QMainWindow):
             super().keyPressEvent(event)
 
     def update_times(self):
+        self.collect_weather()
         if not self.location_sections:
             return
 
-        # Update all sections regardless of visibility
+        # Update all sections regardless of visibility, the clock hands themselves follow the shared frame clock
         for section in self.location_sections:
             city, timezone_str, lat, lon, country_code = section.location_info
             tz = pytz.timezone(timezone_str)
@@ -531,36 +694,39 @@ class WorldClockComparison(QMainWindow):
 
         # Update other UI elements every 10 seconds
         if datetime.now().second % 10 == 0:
-            for i, section in enumerate(self.location_sections):
-                city, _, _, _, country_code = section.location_info
-                country = pycountry.countries.get(alpha_2=country_code)
-                if country:
-                    country_name = country.name
-                    if country_name == "Taiwan, Province of China":
-                        country_name = "Taiwan"
-                else:
-                    country_name = ''
-
-                time_format = "%Y-%m-%d %H:%M" if self.use_24_hour else "%Y-%m-%d %I:%M %p"
-                time_str = datetime.now(pytz.timezone(section.location_info[1])).strftime(time_format)
-                info_text = f"{city} ({section.location_info[1].split('/')[0]}, {country_name})\n{time_str}"
-
-                if i > 0:
-                    prev_city, prev_tz, _, _, _ = self.location_sections[i-1].location_info
-                    prev_time = datetime.now(pytz.timezone(prev_tz))
-                    current_time = datetime.now(pytz.timezone(section.location_info[1]))
-                    offset1 = prev_time.utcoffset().total_seconds() / 3600
-                    offset2 = current_time.utcoffset().total_seconds() / 3600
-                    time_diff = offset2 - offset1
-                    hours, minutes = divmod(abs(time_diff), 1)
-                    hours = int(hours)
-                    minutes = int(minutes * 60)
-                    direction = "ahead of" if time_diff > 0 else "behind"
-                    diff_str = f"{hours}h {minutes}m {direction} {prev_city}"
-                    info_text += f"\nΔ {diff_str}"
-
-                section.info_label.setText(info_text)
-                self.update_weather(section, section.location_info[2], section.location_info[3])
+            self.update_info()
+
+    def update_info(self):
+        for i, section in enumerate(self.location_sections):
+            city, _, _, _, country_code = section.location_info
+            country = pycountry.countries.get(alpha_2=country_code)
+            if country:
+                country_name = country.name
+                if country_name == "Taiwan, Province of China":
+                    country_name = "Taiwan"
+            else:
+                country_name = ''
+
+            time_format = "%Y-%m-%d %H:%M" if self.use_24_hour else "%Y-%m-%d %I:%M %p"
+            time_str = datetime.now(pytz.timezone(section.location_info[1])).strftime(time_format)
+            info_text = f"{city} ({section.location_info[1].split('/')[0]}, {country_name})\n{time_str}"
+
+            if i > 0:
+                prev_city, prev_tz, _, _, _ = self.location_sections[i-1].location_info
+                prev_time = datetime.now(pytz.timezone(prev_tz))
+                current_time = datetime.now(pytz.timezone(section.location_info[1]))
+                offset1 = prev_time.utcoffset().total_seconds() / 3600
+                offset2 = current_time.utcoffset().total_seconds() / 3600
+                time_diff = offset2 - offset1
+                hours, minutes = divmod(abs(time_diff), 1)
+                hours = int(hours)
+                minutes = int(minutes * 60)
+                direction = "ahead of" if time_diff > 0 else "behind"
+                diff_str = f"{hours}h {minutes}m {direction} {prev_city}"
+                info_text += f"\nΔ {diff_str}"
+
+            section.info_label.setText(info_text)
+            self.update_weather(section, section.location_info[2], section.location_info[3])
 
     def update_weather(self, section, lat, lon):
         api_key = self.check_api_key()
@@ -569,24 +735,45 @@ class WorldClockComparison(QMainWindow):
             if not api_key:
                 section.weather_label.setText("No API key provided")
                 return
+        if section in self.weather_requests:
+            return  # The previous request for this location is still running
         url = f"http://api.openweathermap.org/data/2.5/weather?lat={lat}&lon={lon}&appid={api_key}&units=metric"
+        self.weather_requests[section] = self.weather_pool.submit(self.fetch_weather, url)
+
+    @staticmethod
+    def fetch_weather(url):
+        # Runs on the weather thread pool so a slow request never holds up the clocks, must not touch any widget
         try:
-            response = requests.get(url)
+            response = requests.get(url, timeout=10)
             response.raise_for_status()  # Raise an exception for bad status codes
         except requests.exceptions.HTTPError as e:
             if e.response.status_code == 401:
-                section.weather_label.setText("Error loading weather")
+                return None, "Error loading weather"
             elif e.response.status_code == 400:
-                section.weather_label.setText("Bad request. Please check the API request format.")
+                return None, "Bad request. Please check the API request format."
             else:
-                section.weather_label.setText("API request failed: " + str(e))
-            return
+                return None, "API request failed: " + str(e)
         except requests.exceptions.RequestException as e:
-            section.weather_label.setText("API request failed: " + str(e))
-            return
+            return None, "API request failed: " + str(e)
+        try:
+            return response.json(), None
+        except ValueError as e:
+            return None, "Error loading weather: " + str(e)
+
+    def collect_weather(self):
+        # Show the weather requests that finished since the last call
+        for section, request in list(self.weather_requests.items()):
+            if request.done():
+                del self.weather_requests[section]
+                if section in self.location_sections:  # Skip locations removed while the request ran
+                    data, error = request.result()
+                    if error:
+                        section.weather_label.setText(error)
+                    else:
+                        self.show_weather(section, data)
 
+    def show_weather(self, section, data):
         try:
-            data = response.json()
             if "weather" in data and "main" in data and "wind" in data:
                 weather_icon = self.get_weather_icon(data["weather"][0]["icon"])
                 weather_icon_pixmap = QPixmap(weather_icon)
@@ -597,11 +784,23 @@ class WorldClockComparison(QMainWindow):
                 temp_fahrenheit = round((temp_celsius * 9/5) + 32)
                 weather_text = f"{temp_celsius}°C ({temp_fahrenheit}°F)\nWind: {data['wind']['speed']}m/s\nHumidity: {data['main']['humidity']}%"
                 section.weather_label.setText(weather_text)
+
+                # Keep the sample in the bounded history and refresh the sparklines
+                key = self.weather_history.location_key(section.location_info)
+                precipitation = data.get('rain', {}).get('1h', 0) + data.get('snow', {}).get('1h', 0)
+                self.weather_history.record(key, data.get('dt', datetime.now().timestamp()), temp_celsius,
+                                            data['main']['humidity'], data['wind']['speed'], precipitation)
+                self.update_weather_trend(section)
             else:
                 section.weather_label.setText("Error loading weather")
         except Exception as e:
             section.weather_label.setText("Error loading weather: " + str(e))
             
+    def update_weather_trend(self, section):
+        key = self.weather_history.location_key(section.location_info)
+        section.weather_trend.set_series({name: self.weather_history.series(key, name)
+                                          for name, _, _ in WeatherTrendWidget.TRENDS})
+
     def get_weather_icon(self, icon_code):
         # Map the icon code to a weather icon
         icon_map = {
@@ -631,6 +830,14 @@ class WorldClockComparison(QMainWindow):
         self.format_toggle.setText("12 hr" if self.use_24_hour else "24 hr")
         self.update_times()
 
+    def toggle_sweep(self):
+        # Cycle the second hand between ticking, 30 fps and 60 fps sweep
+        frame_clock = ClockWidget.shared_frame_clock()
+        modes = (0, 30, 60)
+        fps = modes[(modes.index(frame_clock.target_fps) + 1) % len(modes)]
+        frame_clock.set_target_fps(fps)
+        self.sweep_toggle.setText(f"Sweep: {fps} fps" if fps else "Sweep: off")
+
     def add_location(self):
         city = self.location_input.text().strip().capitalize()
         if city:
@@ -645,6 +852,7 @@ class WorldClockComparison(QMainWindow):
                         section.location_info = (city, timezone_str, location.latitude, location.longitude, country_code)
                         self.location_sections.append(section)
                         self.scroll_layout.addWidget(section)
+                        self.update_weather_trend(section)  # Show history recorded in earlier runs
                         self.location_input.clear()
                     else:
                         self.show_error(f"Could not determine timezone for {city}")
@@ -659,12 +867,14 @@ class WorldClockComparison(QMainWindow):
                 if section.hasFocus():
                     self.location_sections.remove(section)
                     self.scroll_layout.removeWidget(section)
+                    self.weather_history.discard(self.weather_history.location_key(section.location_info))
                     section.deleteLater()
                     self.update_times()
                     break
         else:
             self.location_sections.remove(section)
             self.scroll_layout.removeWidget(section)
+            self.weather_history.discard(self.weather_history.location_key(section.location_info))
             section.deleteLater()
         self.update_times()
 
@@ -711,13 +921,146 @@ class WorldClockComparison(QMainWindow):
             super().keyPressEvent(event)
 
     def show_error(self, message):
+        if self.headless:
+            print(message)
         error_label = QLabel(message)
         error_label.setStyleSheet("color: #FF6666; font-size: 14px; font-weight: bold;")
         self.layout.addWidget(error_label)
         QTimer.singleShot(3000, error_label.deleteLater)
 
+class BoardRenderer:
+    # Renders the board of a hidden WorldClockComparison into one preallocated QImage at a fixed interval
+    SHM_HEADER = struct.Struct("<QII")  # Sequence number, width, height, followed by the RGBA pixels
+    FIRST_WEATHER_TIMEOUT = 15  # Seconds the first frame waits for the weather
+
+    def __init__(self, window, width=1000, output="board.png", image_format="png", shm_name=None):
+        self.window = window
+        self.output = output
+        self.image_format = image_format
+        self.frame = 0
+        self.background = QColor("#121212")
+
+        # Fill in the clocks, labels and weather so the first frame is not blank
+        window.update_times()
+        window.update_info()
+        wait(window.weather_requests.values(), timeout=self.FIRST_WEATHER_TIMEOUT)
+        window.collect_weather()
+
+        # Take the board out of the scroll area so it can be sized to fit every location
+        self.board = window.scroll_area.takeWidget()
+        self.board.setStyleSheet(window.styleSheet())
+        self.board.layout().activate()
+        self.board.resize(width, max(self.board.sizeHint().height(), 1))
+        self.image = QImage(self.board.size(), QImage.Format.Format_RGBA8888)
+        self.painter = QPainter()
+        self.frame_bytes = self.image.sizeInBytes()
+
+        self.shm = None
+        self.sequence = 0
+        if shm_name:
+            self.shm = shared_memory.SharedMemory(name=shm_name, create=True, size=self.SHM_HEADER.size + self.frame_bytes)
+            self.SHM_HEADER.pack_into(self.shm.buf, 0, self.sequence, self.image.width(), self.image.height())
+            print(f"Rendering {self.image.width()}x{self.image.height()} RGBA frames into shared memory '{shm_name}'")
+        else:
+            print(f"Rendering {self.image.width()}x{self.image.height()} {image_format.upper()} frames to {output}")
+
+        self.timer = QTimer()
+        self.timer.timeout.connect(self.render_frame)
+
+    def start(self, interval):
+        self.render_frame()
+        self.timer.start(round(interval * 1000))
+
+    def render_frame(self):
+        # Bring the clocks up to date, the shared frame clock may be up to a second behind
+        now = datetime.now(pytz.utc)
+        for section in self.window.location_sections:
+            section.clock.advance(now)
+
+        self.image.fill(self.background)
+        self.painter.begin(self.image)
+        self.board.render(self.painter)
+        self.painter.end()
+
+        bits = self.image.constBits()
+        bits.setsize(self.frame_bytes)
+        if self.shm is not None:
+            self.write_shared_frame(bits)
+        elif "{frame}" in self.output:
+            self.write_frame(self.output.format(frame=self.frame), bits)
+        elif self.write_frame(self.output + ".tmp", bits):
+            # Written next to the target and swapped in so readers never see a half written frame
+            try:
+                os.replace(self.output + ".tmp", self.output)
+            except OSError as e:
+                print(f"Error writing frame {self.output}: {e}")
+        self.frame += 1
+
+    def write_shared_frame(self, bits):
+        # The sequence number is odd while the pixels are being copied, so a reader that sees
+        # the same even number before and after its own copy knows the frame is complete
+        offset = self.SHM_HEADER.size
+        self.sequence += 1
+        self.SHM_HEADER.pack_into(self.shm.buf, 0, self.sequence, self.image.width(), self.image.height())
+        self.shm.buf[offset:offset + self.frame_bytes] = bits
+        self.sequence += 1
+        self.SHM_HEADER.pack_into(self.shm.buf, 0, self.sequence, self.image.width(), self.image.height())
+
+    def write_frame(self, path, bits):
+        try:
+            if self.image_format == "png":
+                if not self.image.save(path, "PNG"):
+                    print(f"Error writing frame {path}")
+                    return False
+            else:
+                # Same header as the shared memory block, with the frame number as the sequence number
+                with open(path, "wb") as file:
+                    file.write(self.SHM_HEADER.pack(self.frame, self.image.width(), self.image.height()))
+                    file.write(bits)
+        except OSError as e:
+            print(f"Error writing frame {path}: {e}")
+            return False
+        return True
+
+    def close(self):
+        self.timer.stop()
+        if self.shm is not None:
+            self.shm.close()
+            self.shm.unlink()
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="World Clock Comparison")
+    parser.add_argument("--headless", action="store_true", help="render the board to images without opening a window")
+    parser.add_argument("--locations", default="", help="comma separated cities to show, e.g. 'London,Tokyo'")
+    parser.add_argument("--output", default="board.png", help="frame file, '{frame}' in the name numbers each frame")
+    parser.add_argument("--format", choices=("png", "rgba"), default="png", help="PNG images or raw RGBA bytes")
+    parser.add_argument("--shm", help="write raw RGBA frames into this shared memory block instead of a file")
+    parser.add_argument("--interval", type=float, default=1.0, help="seconds between frames")
+    parser.add_argument("--width", type=int, default=1000, help="frame width in pixels")
+    args = parser.parse_known_args()[0]
+    if args.interval <= 0:
+        parser.error("--interval must be greater than 0")
+    if args.width <= 0:
+        parser.error("--width must be greater than 0")
+    return args
+
 if __name__ == "__main__":
+    args = parse_args()
+    if args.headless:
+        os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
     app = QApplication(sys.argv)
-    window = WorldClockComparison()
-    window.show()
+    window = WorldClockComparison(headless=args.headless)
+    app.aboutToQuit.connect(lambda: window.weather_pool.shutdown(wait=False, cancel_futures=True))
+    for city in filter(None, (city.strip() for city in args.locations.split(","))):
+        window.location_input.setText(city)
+        window.add_location()
+    if args.headless:
+        renderer = BoardRenderer(window, args.width, args.output, args.format, args.shm)
+        app.aboutToQuit.connect(renderer.close)
+        # Quit cleanly on Ctrl+C or a service stop, the timers give Python a chance to run the handler
+        signal.signal(signal.SIGINT, lambda *args: app.quit())
+        signal.signal(signal.SIGTERM, lambda *args: app.quit())
+        renderer.start(args.interval)
+    else:
+        window.show()
     sys.exit(app.exec())
\ No newline at end of file
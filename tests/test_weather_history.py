@@ -0,0 +1,117 @@
+import os
+from array import array
+
+from weather_history import WeatherHistory
+
+KEY = "London_gb"
+
+def record(history, timestamp):
+    history.record(KEY, float(timestamp), float(timestamp), 50.0, 3.0, 0.0)
+
+def test_ring_wraps_around_and_reloads(tmp_path):
+    history = WeatherHistory(str(tmp_path), capacity=3)
+    for timestamp in range(1, 6):
+        record(history, timestamp)
+    assert list(history.series(KEY, "temp")) == [3.0, 4.0, 5.0]
+
+    reloaded = WeatherHistory(str(tmp_path), capacity=3)
+    assert list(reloaded.series(KEY, "time")) == [3.0, 4.0, 5.0]
+    record(reloaded, 6)
+    assert list(reloaded.series(KEY, "temp")) == [4.0, 5.0, 6.0]
+
+def test_reload_with_larger_capacity(tmp_path):
+    history = WeatherHistory(str(tmp_path), capacity=3)
+    for timestamp in range(1, 6):
+        record(history, timestamp)
+    reloaded = WeatherHistory(str(tmp_path), capacity=10)
+    assert list(reloaded.series(KEY, "temp")) == [1.0, 2.0, 3.0, 4.0, 5.0]
+
+def test_repeated_observation_is_skipped(tmp_path):
+    history = WeatherHistory(str(tmp_path), capacity=3)
+    record(history, 1)
+    record(history, 1)
+    assert list(history.series(KEY, "time")) == [1.0]
+    assert os.path.getsize(history.column_path(KEY, "time")) == 8
+
+def test_torn_column_is_truncated(tmp_path):
+    history = WeatherHistory(str(tmp_path), capacity=3)
+    record(history, 1)
+    # A crash after the time column was written but before temp was
+    with open(history.column_path(KEY, "time"), "ab") as file:
+        file.write(array("d", [2.0]).tobytes())
+    with open(history.column_path(KEY, "temp"), "ab") as file:
+        file.write(b"\x01\x02")
+
+    reloaded = WeatherHistory(str(tmp_path), capacity=3)
+    assert list(reloaded.series(KEY, "time")) == [1.0]
+    record(reloaded, 3)
+    assert list(WeatherHistory(str(tmp_path), capacity=3).series(KEY, "temp")) == [1.0, 3.0]
+
+def test_orphan_row_without_complete_rows_is_truncated(tmp_path):
+    history = WeatherHistory(str(tmp_path), capacity=3)
+    os.makedirs(history.directory, exist_ok=True)
+    with open(history.column_path(KEY, "time"), "wb") as file:
+        file.write(array("d", [100.0]).tobytes())
+    record(history, 200)
+
+    reloaded = WeatherHistory(str(tmp_path), capacity=3)
+    assert list(reloaded.series(KEY, "time")) == [200.0]
+    assert list(reloaded.series(KEY, "temp")) == [200.0]
+
+def compacted_history(tmp_path):
+    history = WeatherHistory(str(tmp_path), capacity=2)
+    for timestamp in range(1, 9):
+        record(history, timestamp)
+    assert history.disk_counts[KEY] == 8
+    return history
+
+def write_tmp_columns(history, values):
+    for name, typecode in history.COLUMNS:
+        with open(history.column_path(KEY, name) + ".tmp", "wb") as file:
+            file.write(array(typecode, values).tobytes())
+
+def test_interrupted_compaction_with_marker_is_finished(tmp_path):
+    history = compacted_history(tmp_path)
+    write_tmp_columns(history, [8.0, 9.0])
+    open(history.marker_path(KEY), "w").close()
+    # Only the time column was swapped in before the crash
+    os.replace(history.column_path(KEY, "time") + ".tmp", history.column_path(KEY, "time"))
+
+    reloaded = WeatherHistory(str(tmp_path), capacity=2)
+    assert list(reloaded.series(KEY, "time")) == [8.0, 9.0]
+    assert list(reloaded.series(KEY, "temp")) == [8.0, 9.0]
+    assert not os.path.exists(history.marker_path(KEY))
+    assert not any(name.endswith(".tmp") for name in os.listdir(tmp_path))
+
+def test_interrupted_compaction_without_marker_keeps_old_files(tmp_path):
+    history = compacted_history(tmp_path)
+    write_tmp_columns(history, [8.0, 9.0])
+
+    reloaded = WeatherHistory(str(tmp_path), capacity=2)
+    assert list(reloaded.series(KEY, "time")) == [7.0, 8.0]
+    assert list(reloaded.series(KEY, "temp")) == [7.0, 8.0]
+    assert reloaded.disk_counts[KEY] == 8
+    assert not any(name.endswith(".tmp") for name in os.listdir(tmp_path))
+
+def test_compaction_bounds_the_files(tmp_path):
+    history = compacted_history(tmp_path)
+    record(history, 9)
+    assert history.disk_counts[KEY] == 2
+    assert os.path.getsize(history.column_path(KEY, "temp")) == 2 * 4
+    assert list(WeatherHistory(str(tmp_path), capacity=2).series(KEY, "temp")) == [8.0, 9.0]
+
+def test_load_error_keeps_files(tmp_path, monkeypatch):
+    history = WeatherHistory(str(tmp_path), capacity=3)
+    record(history, 1)
+
+    reloaded = WeatherHistory(str(tmp_path), capacity=3)
+    def fail(*args, **kwargs):
+        raise OSError("Too many open files")
+    monkeypatch.setattr("weather_history.mmap.mmap", fail)
+    record(reloaded, 2)
+    assert list(reloaded.series(KEY, "time")) == []
+    monkeypatch.undo()
+
+    assert list(reloaded.series(KEY, "time")) == [1.0]
+    record(reloaded, 3)
+    assert list(WeatherHistory(str(tmp_path), capacity=3).series(KEY, "time")) == [1.0, 3.0]
@@ -0,0 +1,146 @@
+import os
+import re
+import mmap
+from array import array
+
+class WeatherRing:
+    # Fixed-size ring of weather samples, one packed array per column
+    def __init__(self, columns, capacity):
+        self.capacity = capacity
+        self.columns = {name: array(typecode, bytes(array(typecode).itemsize * capacity)) for name, typecode in columns}
+        self.head = 0  # Index of the next slot to overwrite
+        self.count = 0
+
+    def append(self, values):
+        for name, value in values.items():
+            self.columns[name][self.head] = value
+        self.head = (self.head + 1) % self.capacity
+        self.count = min(self.count + 1, self.capacity)
+
+    def series(self, name):
+        # Samples in chronological order, oldest first
+        column = self.columns[name]
+        if self.count < self.capacity:
+            return column[:self.count]
+        return column[self.head:] + column[:self.head]
+
+class WeatherHistory:
+    # One append-only file per column and location, e.g. history/London_gb.temp.bin
+    COLUMNS = (("time", "d"), ("temp", "f"), ("humidity", "f"), ("wind", "f"), ("precipitation", "f"))
+    COMPACT_FACTOR = 4  # Rewrite the files once they hold this many rings worth of samples
+
+    def __init__(self, directory="history", capacity=360):
+        self.directory = directory
+        self.capacity = capacity  # Samples kept in memory per location
+        self.rings = {}
+        self.disk_counts = {}
+
+    @staticmethod
+    def location_key(location_info):
+        city, _, _, _, country_code = location_info
+        return re.sub(r"[^A-Za-z0-9_-]", "_", f"{city}_{country_code}")
+
+    def column_path(self, key, name):
+        return os.path.join(self.directory, f"{key}.{name}.bin")
+
+    def ring(self, key):
+        if key not in self.rings:
+            try:
+                self.rings[key] = self.load(key)
+            except (OSError, ValueError) as e:
+                # Leave the files alone and try loading them again on the next access
+                print(f"Error loading weather history for {key}: {e}")
+                return WeatherRing(self.COLUMNS, self.capacity)
+        return self.rings[key]
+
+    def marker_path(self, key):
+        # Present while a compaction is swapping its .tmp files in
+        return os.path.join(self.directory, f"{key}.compact")
+
+    def load(self, key):
+        self.recover_compaction(key)
+        ring = WeatherRing(self.COLUMNS, self.capacity)
+        sizes = []
+        for name, _ in self.COLUMNS:
+            try:
+                sizes.append(os.path.getsize(self.column_path(key, name)))
+            except FileNotFoundError:
+                sizes.append(0)
+        # A crash between column writes leaves some files one sample (or part of one) longer, keep only complete rows
+        stored = min(size // array(typecode).itemsize for (_, typecode), size in zip(self.COLUMNS, sizes))
+        start = max(stored - self.capacity, 0)
+        for (name, typecode), size in zip(self.COLUMNS, sizes):
+            itemsize = array(typecode).itemsize
+            if size != stored * itemsize:
+                os.truncate(self.column_path(key, name), stored * itemsize)
+        for name, typecode in self.COLUMNS:
+            if stored == 0:
+                break
+            itemsize = array(typecode).itemsize
+            with open(self.column_path(key, name), "rb") as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                column = array(typecode, mapped[start * itemsize:stored * itemsize])
+            ring.columns[name][:len(column)] = column
+        ring.count = stored - start
+        ring.head = ring.count % self.capacity
+        self.disk_counts[key] = stored
+        return ring
+
+    def recover_compaction(self, key):
+        tmp_paths = [self.column_path(key, name) + ".tmp" for name, _ in self.COLUMNS]
+        if os.path.exists(self.marker_path(key)):
+            # Every .tmp file was complete before the marker was written, finish swapping them in
+            for tmp_path in tmp_paths:
+                if os.path.exists(tmp_path):
+                    os.replace(tmp_path, tmp_path[:-len(".tmp")])
+            os.remove(self.marker_path(key))
+        else:
+            # Interrupted before the swap started, the old files are still intact
+            for tmp_path in tmp_paths:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+
+    def record(self, key, timestamp, temp, humidity, wind, precipitation):
+        values = {"time": timestamp, "temp": temp, "humidity": humidity, "wind": wind, "precipitation": precipitation}
+        ring = self.ring(key)
+        if key not in self.rings:
+            return  # The history files could not be read, appending now could misalign them
+        # The weather is polled every 10 seconds but the observation only changes every few minutes
+        if ring.count and ring.columns["time"][ring.head - 1] == timestamp:
+            return
+        ring.append(values)
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            if self.disk_counts.get(key, 0) >= self.capacity * self.COMPACT_FACTOR:
+                self.compact(key)
+            else:
+                for name, typecode in self.COLUMNS:
+                    with open(self.column_path(key, name), "ab") as file:
+                        file.write(array(typecode, [values[name]]).tobytes())
+                self.disk_counts[key] = self.disk_counts.get(key, 0) + 1
+        except OSError as e:
+            print(f"Error saving weather history for {key}: {e}")
+            # A partly written row or compaction is repaired when the files are loaded again
+            self.discard(key)
+
+    def compact(self, key):
+        # Replace the spill files with the current ring contents so disk usage stays bounded too.
+        # All .tmp files are written before any is swapped in, and the marker lets load finish an interrupted swap
+        ring = self.ring(key)
+        for name, _ in self.COLUMNS:
+            with open(self.column_path(key, name) + ".tmp", "wb") as file:
+                file.write(ring.series(name).tobytes())
+        with open(self.marker_path(key), "w"):
+            pass
+        for name, _ in self.COLUMNS:
+            path = self.column_path(key, name)
+            os.replace(path + ".tmp", path)
+        os.remove(self.marker_path(key))
+        self.disk_counts[key] = ring.count
+
+    def series(self, key, name):
+        return self.ring(key).series(name)
+
+    def discard(self, key):
+        # Drop the in-memory ring, its files stay and are loaded again on the next access
+        self.rings.pop(key, None)
+        self.disk_counts.pop(key, None)